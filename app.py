@@ -5,7 +5,6 @@ import numpy as np
 import streamlit as st
 import gspread
 from google.oauth2.service_account import Credentials
-from dateutil.relativedelta import relativedelta
 
 # =====================================================
 # PAGE CONFIG (MUST BE FIRST STREAMLIT CALL)
@@ -61,35 +60,22 @@ except Exception:
 # =====================================================
 # HELPER FUNCTIONS
 # =====================================================
-TRUE_VALUES = {"true", "yes", "1", "y", "checked", "x"}
+TRUE_VALUES = frozenset({"true", "yes", "1", "y", "checked", "x"})
 
 def to_bool(series: pd.Series) -> pd.Series:
-    return (
-        series.fillna("")
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .isin(TRUE_VALUES)
-    )
+    # blanks stay <NA> and fall out of isin as False, so no fillna pass
+    return series.str.strip().str.lower().isin(TRUE_VALUES)
 
 def to_money(series: pd.Series) -> pd.Series:
     # robust: handles "$", ",", blanks, and spreadsheet errors like "#VALUE!"
-    cleaned = (
-        series.fillna("")
-        .astype(str)
-        .str.strip()
-        .str.replace("$", "", regex=False)
-        .str.replace(",", "", regex=False)
-    )
-    return pd.to_numeric(cleaned, errors="coerce").fillna(0.0)
+    # strip() first: Arrow's trim is Unicode-aware (e.g. "$12.50\xa0"), the regex \s is ASCII-only
+    cleaned = series.str.strip().str.replace(r"[$,\s]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce").fillna(0.0).astype(np.float64)
 
 def normalize_name(series: pd.Series) -> pd.Series:
-    return (
-        series.fillna("")
-        .astype(str)
-        .str.replace(r"\s+", " ", regex=True)
-        .str.strip()
-    )
+    # trim first so the regex only has interior runs left to collapse
+    # \p{Z} too: RE2's \s is ASCII-only, so "Dan\xa0Lee" would split from "Dan Lee"
+    return series.str.strip().str.replace(r"[\s\p{Z}]+", " ", regex=True)
 
 # =====================================================
 # LOAD GOOGLE SHEET (ROBUST VERSION)
@@ -117,93 +103,142 @@ def load_data() -> pd.DataFrame:
     headers = [h.strip() for h in values[0]]
     rows = values[1:]
 
-    df = pd.DataFrame(rows, columns=headers)
-    df.columns = [c.strip() for c in df.columns]
-    return df
+    # Arrow-backed strings from the start: the helpers' .str ops run in
+    # Arrow's C++ kernels and no per-column astype(str) is needed later
+    return pd.DataFrame(rows, columns=headers, dtype="string[pyarrow]")
 
 # =====================================================
 # PREP DATA (DO NOT DROP INACTIVE HERE)
 # =====================================================
 def prepare_data(df_raw: pd.DataFrame) -> pd.DataFrame:
-    df = df_raw.copy()
-
     required_cols = ["Timestamp", "Clients", "Purchased", "Inactive", "Clean Cost"]
-    missing = [c for c in required_cols if c not in df.columns]
+    missing = [c for c in required_cols if c not in df_raw.columns]
     if missing:
-        raise ValueError(f"Missing required columns: {missing}. Found: {df.columns.tolist()}")
-
-    df["Clients"] = normalize_name(df["Clients"])
-    df["Client_key"] = df["Clients"].str.lower()
-
-    df["Purchased_bool"] = to_bool(df["Purchased"])
-    df["Inactive_bool"] = to_bool(df["Inactive"])
-
-    df["Timestamp_dt"] = pd.to_datetime(df["Timestamp"], errors="coerce")
-    df["Amount"] = to_money(df["Clean Cost"])
+        raise ValueError(f"Missing required columns: {missing}. Found: {df_raw.columns.tolist()}")
+
+    # assign() returns a new frame without deep-copying the raw columns
+    clients = normalize_name(df_raw["Clients"])
+    df = df_raw.assign(
+        Clients=clients,
+        Client_key=clients.str.lower().astype("category"),
+        Purchased_bool=to_bool(df_raw["Purchased"]),
+        Inactive_bool=to_bool(df_raw["Inactive"]),
+        Timestamp_dt=pd.to_datetime(df_raw["Timestamp"], errors="coerce").astype("datetime64[s]"),
+        Amount=to_money(df_raw["Clean Cost"]),
+    )
 
-    return df
+    # sort once so every Client_key groupby can skip its own sort (sort=False);
+    # stable keeps sheet order within a client, so "first" name is unchanged
+    return df.sort_values("Client_key", kind="stable")
 
 # =====================================================
 # RESET MODEL SUMMARY LOGIC (ACTIVE CLIENTS ONLY)
 # =====================================================
+STATUSES = [
+    "Eligible",
+    "Purchased",
+    "Place Order",
+    "Over Budget — Pending",
+    "Not Eligible — Wait 6 Months"
+]
+
 def build_summary(df_all: pd.DataFrame) -> pd.DataFrame:
     # Operational dashboard should only show ACTIVE clients
-    df = df_all[df_all["Inactive_bool"] == False].copy()
+    df = df_all[df_all["Inactive_bool"] == False]
 
     today = pd.Timestamp.today().normalize()
-    summary_rows = []
-
-    for client_key, group in df.groupby("Client_key"):
-
-        client_name = group["Clients"].iloc[0]
-        purchases = group[group["Purchased_bool"] == True].copy()
-        pending = group[group["Purchased_bool"] == False].copy()
-
-        if purchases.empty or purchases["Timestamp_dt"].isna().all():
-            last_purchase = pd.NaT
-            reset_date = pd.NaT
-            purchased_cycle = 0.0
-            remaining = BUDGET
-        else:
-            last_purchase = purchases["Timestamp_dt"].max()
-            reset_date = last_purchase + relativedelta(months=6)
-
-            if today >= reset_date:
-                purchased_cycle = 0.0
-                remaining = BUDGET
-            else:
-                cycle_start = last_purchase - relativedelta(months=6)
-                purchases_in_cycle = purchases[purchases["Timestamp_dt"] >= cycle_start]
-                purchased_cycle = float(purchases_in_cycle["Amount"].sum())
-                remaining = max(BUDGET - purchased_cycle, 0.0)
 
-        pending_total = float(pending["Amount"].sum())
+    purchases = df[df["Purchased_bool"]]
 
-        # ACTION STATUS LOGIC
-        if pending_total > 0:
-            if pending_total > remaining:
-                action_status = "Over Budget — Pending"
-            else:
-                action_status = "Place Order"
-        else:
-            if remaining == BUDGET:
-                action_status = "Eligible"
-            elif remaining == 0:
-                action_status = "Not Eligible — Wait 6 Months"
-            else:
-                action_status = "Purchased"
+    # one row per client, in the same order groupby would visit them
+    clients = df.groupby("Client_key", sort=False, observed=True)["Clients"].first()
 
-        summary_rows.append({
-            "Client": client_name,
-            "Purchased Total (Current Cycle)": purchased_cycle,
-            "Pending Total": pending_total,
-            "Remaining Balance": remaining,
-            "Action Status": action_status,
-            "Last Purchase Date": last_purchase,
-            "Next Reset Date": reset_date
-        })
+    # last purchase per client (NaT when there are no dated purchases)
+    last_purchase = (
+        purchases.groupby("Client_key", sort=False, observed=True)["Timestamp_dt"].max()
+        .reindex(clients.index)
+    )
+    reset_date = last_purchase + pd.DateOffset(months=6)
+    cycle_start = last_purchase - pd.DateOffset(months=6)
+
+    # purchases only count while the client's reset date is still ahead;
+    # reindex (not .map) broadcasts per client, since Categorical.map can
+    # hand back a categorical of dates
+    row_cycle_start = cycle_start.reindex(df["Client_key"]).to_numpy()
+    row_reset_date = reset_date.reindex(df["Client_key"]).to_numpy()
+    in_cycle = (
+        df["Purchased_bool"]
+        & (df["Timestamp_dt"] >= row_cycle_start)
+        & (row_reset_date > today)
+    )
 
-    return pd.DataFrame(summary_rows).sort_values("Client")
+    # bucket every row (out-of-cycle purchases get code -1 / NaN and are
+    # dropped by the groupby) so both totals come out of a single pass
+    bucket = pd.Series(
+        pd.Categorical.from_codes(
+            np.select([in_cycle, ~df["Purchased_bool"]], [0, 1], default=-1),
+            categories=["purchased", "pending"],
+        ),
+        index=df.index,
+    )
+
+    totals = (
+        df.groupby(["Client_key", bucket], sort=False, observed=True)["Amount"].sum()
+        .unstack(fill_value=0.0)
+        .reindex(index=clients.index, columns=["purchased", "pending"], fill_value=0.0)
+    )
+    purchased_cycle = totals["purchased"]
+    pending_total = totals["pending"]
+    remaining = (BUDGET - purchased_cycle).clip(lower=0.0)
+
+    # ACTION STATUS LOGIC
+    has_pending = pending_total > 0
+    action_status = np.select(
+        [
+            has_pending & (pending_total > remaining),
+            has_pending,
+            remaining == BUDGET,
+            remaining == 0,
+        ],
+        [
+            "Over Budget — Pending",
+            "Place Order",
+            "Eligible",
+            "Not Eligible — Wait 6 Months",
+        ],
+        default="Purchased",
+    )
+
+    summary = pd.DataFrame({
+        "Client": clients,
+        "Purchased Total (Current Cycle)": purchased_cycle,
+        "Pending Total": pending_total,
+        "Remaining Balance": remaining,
+        "Action Status": pd.Categorical(action_status, categories=STATUSES),
+        "Last Purchase Date": last_purchase,
+        "Next Reset Date": reset_date,
+    }).reset_index(drop=True)
+
+    return summary.sort_values("Client")
+
+# =====================================================
+# CACHED PIPELINE (WIDGET RERUNS SKIP PARSE + SUMMARY)
+# =====================================================
+def hash_frame(df: pd.DataFrame) -> bytes:
+    # hash_pandas_object only sees cell values; fold in headers + dtypes so a
+    # renamed column still misses the cache and hits the required-column check
+    schema = "\x1f".join(f"{c}:{t}" for c, t in df.dtypes.items()).encode()
+    return schema + pd.util.hash_pandas_object(df, index=False).values.tobytes()
+
+@st.cache_data(ttl=CACHE_TTL, hash_funcs={pd.DataFrame: hash_frame})
+def parse_data(df_raw: pd.DataFrame) -> pd.DataFrame:
+    return prepare_data(df_raw)
+
+# keyed on the raw frame, so a rerun hashes the narrow sheet values
+# rather than the wider parsed frame
+@st.cache_data(ttl=CACHE_TTL, hash_funcs={pd.DataFrame: hash_frame})
+def summarize(df_raw: pd.DataFrame) -> pd.DataFrame:
+    return build_summary(parse_data(df_raw))
 
 # =====================================================
 # RUN APP
@@ -214,8 +249,8 @@ try:
         st.warning("No data found in sheet.")
         st.stop()
 
-    df_all = prepare_data(df_raw)
-    summary = build_summary(df_all)
+    df_all = parse_data(df_raw)
+    summary = summarize(df_raw)
 
 except Exception as e:
     st.error("Failed to load data.")
@@ -225,9 +260,11 @@ except Exception as e:
 # =====================================================
 # KPI LOGIC (FINANCIAL / HISTORICAL — INCLUDE INACTIVE)
 # =====================================================
-total_purchased = float(df_all[df_all["Purchased_bool"] == True]["Amount"].sum())
-total_pending = float(df_all[df_all["Purchased_bool"] == False]["Amount"].sum())
-clients_not_eligible = int((summary["Action Status"] == "Not Eligible — Wait 6 Months").sum())
+totals = df_all.groupby("Purchased_bool")["Amount"].sum()
+total_purchased = float(totals.get(True, 0.0))
+total_pending = float(totals.get(False, 0.0))
+status_counts = summary["Action Status"].value_counts()
+clients_not_eligible = int(status_counts.get("Not Eligible — Wait 6 Months", 0))
 
 # =====================================================
 # SIDEBAR (FILTERS + LOGOUT)
@@ -238,20 +275,13 @@ if st.sidebar.button("Logout"):
     st.session_state["auth_ok"] = False
     st.rerun()
 
-statuses = [
-    "Eligible",
-    "Purchased",
-    "Place Order",
-    "Over Budget — Pending",
-    "Not Eligible — Wait 6 Months"
-]
-
-selected_status = st.sidebar.multiselect("Action Status", statuses, default=statuses)
-filtered = summary[summary["Action Status"].isin(selected_status)].copy()
+selected_status = st.sidebar.multiselect("Action Status", STATUSES, default=STATUSES)
+filtered = summary[summary["Action Status"].isin(selected_status)]
 
-selected_client = st.sidebar.selectbox("Client", ["(All)"] + sorted(filtered["Client"].unique().tolist()))
+# summary is already sorted by Client with one row per client, so no re-sort/unique here
+selected_client = st.sidebar.selectbox("Client", ["(All)"] + filtered["Client"].tolist())
 if selected_client != "(All)":
-    filtered = filtered[filtered["Client"] == selected_client].copy()
+    filtered = filtered[filtered["Client"] == selected_client]
 
 if st.sidebar.button("Refresh Data"):
     st.cache_data.clear()
@@ -272,46 +302,33 @@ col5.metric("Active Clients in Summary", int(len(summary)))
 # DATA HEALTH CHECK
 # =====================================================
 with st.expander("🔎 Data Reconciliation"):
+    row_counts = df_all["Purchased_bool"].value_counts()
     st.write({
         "Raw rows pulled from sheet": int(len(df_raw)),
         "Rows parsed (all, incl. inactive)": int(len(df_all)),
-        "Purchased rows (all)": int(df_all["Purchased_bool"].sum()),
-        "Pending rows (all)": int((~df_all["Purchased_bool"]).sum()),
+        "Purchased rows (all)": int(row_counts.get(True, 0)),
+        "Pending rows (all)": int(row_counts.get(False, 0)),
         "Inactive rows (all)": int(df_all["Inactive_bool"].sum()),
         "Total Purchased (all)": f"${total_purchased:,.2f}",
         "Total Pending (all)": f"${total_pending:,.2f}",
         "Active clients shown in summary": int(len(summary)),
     })
 
-# =====================================================
-# FORMAT TABLE
-# =====================================================
-display = filtered.copy()
-
-display["Purchased Total (Current Cycle)"] = display["Purchased Total (Current Cycle)"].map("${:,.2f}".format)
-display["Pending Total"] = display["Pending Total"].map("${:,.2f}".format)
-display["Remaining Balance"] = display["Remaining Balance"].map("${:,.2f}".format)
-
-display["Last Purchase Date"] = pd.to_datetime(display["Last Purchase Date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
-display["Next Reset Date"] = pd.to_datetime(display["Next Reset Date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
-
 # =====================================================
 # DISPLAY TABLE
 # =====================================================
 st.subheader("Client Overview")
 
+# money/date formatting happens client-side; the frame stays numeric
 st.dataframe(
-    display[
-        [
-            "Client",
-            "Purchased Total (Current Cycle)",
-            "Pending Total",
-            "Remaining Balance",
-            "Action Status",
-            "Last Purchase Date",
-            "Next Reset Date"
-        ]
-    ],
+    filtered,
+    column_config={
+        "Purchased Total (Current Cycle)": st.column_config.NumberColumn(format="dollar"),
+        "Pending Total": st.column_config.NumberColumn(format="dollar"),
+        "Remaining Balance": st.column_config.NumberColumn(format="dollar"),
+        "Last Purchase Date": st.column_config.DateColumn(format="YYYY-MM-DD"),
+        "Next Reset Date": st.column_config.DateColumn(format="YYYY-MM-DD"),
+    },
     use_container_width=True,
     hide_index=True
 )